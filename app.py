@@ -1,42 +1,322 @@
-from flask import Flask, request, redirect, url_for, render_template_string, jsonify
+from flask import Flask, request, redirect, url_for, render_template_string, jsonify, g, has_request_context, send_file
+from flask import session as login_session
 import os
+import time
+import click
+import mimetypes
+import uuid
 import logging
-from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime
-from azure.storage.blob import BlobServiceClient
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from log_config import configure_logging, get_log_stats, NO_SAMPLING
+from document_cache import get_cached_document, cache_document
+from blob_tiering import select_tier_changes, BLOB_BATCH_SIZE, COOL_MINIMUM_DAYS
+
+# Heavy dependencies (python-dotenv, SQLAlchemy + pymssql, Azure Storage SDK, and multiprocessing and
+# invoice_extraction for the optional extraction stage) are imported on first use, so cold starts on
+# scale-to-zero platforms only pay for Flask.
+# With FAST_STARTUP=1 configuration is taken from the real environment and .env is not read.
+FAST_STARTUP = os.getenv('FAST_STARTUP', '0').lower() in ('1', 'true', 'yes')
 
 # Load environment variables
-load_dotenv()
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+if not FAST_STARTUP:
+    from dotenv import load_dotenv
+    load_dotenv()
+
+# Configure logging: records are queued and formatted as JSON on a background thread (see log_config.py)
+def _log_context():
+    # Called for every record before sampling; also counts records logged per request
+    if not has_request_context():
+        return None
+    g.log_records = g.get('log_records', 0) + 1
+    return g.get('request_id')
+
+configure_logging(_log_context)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# Signs the login session cookie; without SECRET_KEY no session is set and /invoice_document is unavailable
+app.secret_key = os.getenv('SECRET_KEY')
+
+# Request IDs and per-phase timings
+@app.before_request
+def start_request_timer():
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g.request_start = time.perf_counter()
+    g.phase_timings = {}
+
+@contextmanager
+def phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.phase_timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+@app.after_request
+def log_request(response):
+    duration_ms = round((time.perf_counter() - g.get('request_start', time.perf_counter())) * 1000, 2)
+    # The per-request summary carries the timings, so it is never sampled out
+    logger.info("%s %s %s", request.method, request.path, response.status_code, extra={
+        **NO_SAMPLING,
+        'status': response.status_code,
+        'duration_ms': duration_ms,
+        'phases': g.get('phase_timings', {}),
+        'log_records': g.get('log_records', 0)
+    })
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    return response
+
+# Azure Storage configuration
+AZURE_STORAGE_CONNECTION_STRING = "DefaultEndpointsProtocol=https;AccountName=ngstore;AccountKey=0kOBlNdR/pnuhQazkYliSE8BOyxm/KelSLaOuvGuMfJWRlQLUH2ZCsDd34skmg2dVq11QxODu12s+AStmuHgAQ==;EndpointSuffix=core.windows.net"
+AZURE_CONTAINER_NAME = "invoiceupload"
+
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+WARMUP_ON_START = os.getenv('WARMUP_ON_START', '0').lower() in ('1', 'true', 'yes')
+
+_engine = None
+_session_factory = None
+_container_client = None
+_resource_lock = threading.Lock()
+
+def text(statement):
+    # Deferred sqlalchemy.text so route modules do not import SQLAlchemy at startup
+    from sqlalchemy import text as sql_text
+    return sql_text(statement)
+
+def get_engine():
+    global _engine, _session_factory
+    with _resource_lock:
+        if _engine is None:
+            from sqlalchemy import create_engine
+            from sqlalchemy.orm import sessionmaker
+
+            # Retrieve database credentials from environment variables
+            server = os.getenv('DB_SERVER')
+            database = os.getenv('DB_DATABASE')
+            username = os.getenv('DB_USERNAME')
+            password = os.getenv('DB_PASSWORD')
+
+            # Create SQLAlchemy engine once per process and reuse its connection pool
+            connection_string = f'mssql+pymssql://{username}:{password}@{server}/{database}'
+            _engine = create_engine(connection_string, echo=False, pool_size=DB_POOL_SIZE, pool_pre_ping=True)
+
+            # Create a session factory
+            _session_factory = sessionmaker(bind=_engine)
+        return _engine
+
 # Database Connection Configuration
 def get_db_connection():
     try:
-        # Retrieve database credentials from environment variables
-        server = os.getenv('DB_SERVER')
-        database = os.getenv('DB_DATABASE')
-        username = os.getenv('DB_USERNAME')
-        password = os.getenv('DB_PASSWORD')
-
-        # Create SQLAlchemy engine
-        connection_string = f'mssql+pymssql://{username}:{password}@{server}/{database}'
-        engine = create_engine(connection_string, echo=False)
-        
-        # Create a session factory
-        Session = sessionmaker(bind=engine)
-        return Session()
+        get_engine()
+        return _session_factory()
 
     except Exception as e:
-        logger.error(f"Database connection error: {str(e)}")
+        logger.error("Database connection error: %s", e)
         raise
 
+def get_container_client():
+    global _container_client
+    with _resource_lock:
+        if _container_client is None:
+            from azure.storage.blob import BlobServiceClient
+
+            # Create the BlobServiceClient object
+            blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
+            _container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
+        return _container_client
+
+def warm_up():
+    """Import deferred dependencies and open pooled DB connections on a background thread."""
+    def run():
+        try:
+            get_container_client()
+            engine = get_engine()
+
+            # Check out pool_size connections together so the pool holds them open afterwards
+            connections = []
+            try:
+                for _ in range(DB_POOL_SIZE):
+                    connections.append(engine.connect())
+            finally:
+                for connection in connections:
+                    connection.close()
+
+            logger.info("Warm-up complete: %d database connections pooled", len(connections))
+
+        except Exception as e:
+            logger.warning("Warm-up failed: %s", e)
+
+    thread = threading.Thread(target=run, name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+def init_worker():
+    """Per-process initialisation, called after fork when gunicorn runs with --preload."""
+    global _engine, _session_factory, _container_client, _extraction_pool
+
+    # Connections and executors inherited from the master must not be shared across processes
+    if _engine is not None:
+        _engine.dispose(close=False)
+    _engine = None
+    _session_factory = None
+    _container_client = None
+    _extraction_pool = None
+
+    # The log listener thread does not survive fork; start one for this process
+    configure_logging(_log_context)
+
+    if WARMUP_ON_START:
+        warm_up()
+
+# Invoice field extraction (optional, enable with INVOICE_EXTRACTION_ENABLED=1)
+EXTRACTION_ENABLED = os.getenv('INVOICE_EXTRACTION_ENABLED', '0').lower() in ('1', 'true', 'yes')
+EXTRACTION_WORKERS = int(os.getenv('INVOICE_EXTRACTION_WORKERS', '2'))
+EXTRACTION_TIMEOUT = float(os.getenv('INVOICE_EXTRACTION_TIMEOUT', '20'))
+EXTRACTION_CACHE_SIZE = int(os.getenv('INVOICE_EXTRACTION_CACHE_SIZE', '256'))
+
+_extraction_pool = None
+_extraction_cache = OrderedDict()
+_extraction_lock = threading.Lock()
+
+# Cached in place of the fields for documents whose extraction timed out, so re-uploads fail fast
+EXTRACTION_TIMED_OUT = 'timed_out'
+
+def get_extraction_pool():
+    global _extraction_pool
+    with _extraction_lock:
+        if _extraction_pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Spawn keeps workers free of the parent's threads and sockets. Under gunicorn they import
+            # only invoice_extraction; under `python app.py` spawn also re-imports app.py as __mp_main__.
+            _extraction_pool = ProcessPoolExecutor(
+                max_workers=EXTRACTION_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _extraction_pool
+
+def reset_extraction_pool(pool, kill=False):
+    # Replace a broken or stuck pool; the next request starts fresh workers
+    global _extraction_pool
+    with _extraction_lock:
+        if _extraction_pool is pool:
+            _extraction_pool = None
+
+    if kill:
+        # shutdown() never stops a running job (a hung pypdf parse or OCR run), so terminate the workers.
+        # ProcessPoolExecutor has no public API for this; other jobs on the pool fail and are retried.
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+    pool.shutdown(wait=False)
+
+def _cache_extraction(content_hash, fields):
+    with _extraction_lock:
+        _extraction_cache[content_hash] = fields
+        while len(_extraction_cache) > EXTRACTION_CACHE_SIZE:
+            _extraction_cache.popitem(last=False)
+
+def extract_invoice(file_contents, file_extension):
+    """Suggested fields for an invoice; raises TimeoutError if extraction does not finish in time."""
+    from concurrent.futures import TimeoutError as FutureTimeoutError
+    from concurrent.futures.process import BrokenProcessPool
+    from invoice_extraction import extract_invoice_fields
+
+    # Cache suggestions by content hash so re-uploads of the same document are instant
+    content_hash = hashlib.sha256(file_contents).hexdigest()
+    with _extraction_lock:
+        cached = _extraction_cache.get(content_hash)
+        if cached is not None:
+            _extraction_cache.move_to_end(content_hash)
+    if cached == EXTRACTION_TIMED_OUT:
+        raise TimeoutError('Invoice extraction previously timed out for this document')
+    if cached is not None:
+        return cached
+
+    # tesseract is killed shortly before the request gives up; anything else still running is killed below
+    ocr_timeout = max(EXTRACTION_TIMEOUT - 1, 1)
+    for attempt in range(2):
+        pool = get_extraction_pool()
+        try:
+            fields = pool.submit(extract_invoice_fields, file_contents, file_extension, ocr_timeout).result(timeout=EXTRACTION_TIMEOUT)
+            break
+        except BrokenProcessPool:
+            # A worker died (OOM, crash in tesseract, or killed after another job's timeout); retry once
+            logger.warning("Invoice extraction pool broken, recreating it")
+            reset_extraction_pool(pool)
+            if attempt:
+                raise
+        except FutureTimeoutError as e:
+            reset_extraction_pool(pool, kill=True)
+            _cache_extraction(content_hash, EXTRACTION_TIMED_OUT)
+            # Same class as TimeoutError from Python 3.11; normalised for older interpreters
+            raise TimeoutError('Invoice extraction timed out') from e
+
+    _cache_extraction(content_hash, fields)
+    return fields
+
+# Blob lifecycle tiering for InvoiceDetails documents
+def tier_invoice_documents(cool_after_days, archive_after_days, tier_change_grace_days, batch_size=BLOB_BATCH_SIZE):
+    """Move invoice documents to the Cool/Archive tiers by upload age; returns counts per tier."""
+    session = get_db_connection()
+    try:
+        query = text('''
+            SELECT DISTINCT InvoiceDocument
+            FROM InvoiceDetails
+            WHERE InvoiceDocument IS NOT NULL
+        ''')
+        invoice_documents = {row[0] for row in session.execute(query).fetchall()}
+    finally:
+        session.close()
+
+    container_client = get_container_client()
+    documents = select_tier_changes(
+        container_client.list_blobs(), invoice_documents, datetime.now(timezone.utc),
+        cool_after_days, archive_after_days, tier_change_grace_days
+    )
+
+    results = {}
+    for tier, names in documents.items():
+        moved, failed = 0, 0
+        for start in range(0, len(names), batch_size):
+            batch = names[start:start + batch_size]
+            responses = container_client.set_standard_blob_tier_blobs(tier, *batch, raise_on_any_failure=False)
+            for response in responses:
+                if response.status_code < 300:
+                    moved += 1
+                else:
+                    failed += 1
+        logger.info("Tiered %d invoice documents to %s (%d failed)", moved, tier, failed)
+        results[tier] = {'moved': moved, 'failed': failed}
+    return results
+
+@app.cli.command('tier-invoices')
+@click.option('--cool-after', default=30, show_default=True, help='Move documents uploaded more than this many days ago to Cool.')
+@click.option('--archive-after', default=180, show_default=True,
+              help=f'Move documents uploaded more than this many days ago to Archive (0 disables). Must be at least '
+                   f'--cool-after + {COOL_MINIMUM_DAYS}, as Cool charges for blobs moved out within {COOL_MINIMUM_DAYS} days.')
+@click.option('--tier-change-grace', default=30, show_default=True, help='Leave documents whose tier changed within this many days, e.g. rehydrated ones.')
+@click.option('--batch-size', default=BLOB_BATCH_SIZE, show_default=True, help='Blobs per batch request (at most 256).')
+def tier_invoices_command(cool_after, archive_after, tier_change_grace, batch_size):
+    """Move old invoice documents to cheaper blob tiers, e.g. `flask --app app tier-invoices`."""
+    if archive_after and archive_after < cool_after + COOL_MINIMUM_DAYS:
+        raise click.BadParameter(
+            f'must be at least --cool-after + {COOL_MINIMUM_DAYS} to avoid the Cool tier early-deletion charge',
+            param_hint='--archive-after'
+        )
+    if not 1 <= batch_size <= BLOB_BATCH_SIZE:
+        raise click.BadParameter(f'must be between 1 and {BLOB_BATCH_SIZE}', param_hint='--batch-size')
+
+    results = tier_invoice_documents(cool_after, archive_after, tier_change_grace, batch_size)
+    for tier, counts in results.items():
+        click.echo(f"{tier}: {counts['moved']} moved, {counts['failed']} failed")
+
 # Login Route
 @app.route('/', methods=['GET', 'POST'])
 def login():
@@ -50,20 +330,24 @@ def login():
             
             # Execute query using SQLAlchemy
             query = text('SELECT userID FROM MobiUser WHERE userName = :username AND password = :password')
-            result = session.execute(query, {'username': username, 'password': password}).fetchone()
+            with phase('db_query'):
+                result = session.execute(query, {'username': username, 'password': password}).fetchone()
             
             # Close the session
             session.close()
 
             if result:
-                # Successful login
+                # Successful login; the signed session identifies the user to /invoice_document
+                if app.secret_key:
+                    login_session.clear()
+                    login_session['user_id'] = result[0]
                 return redirect(url_for('dashboard', user_id=result[0]))
             else:
                 # Invalid credentials
                 return render_template_string(login_page, error='Invalid username or password')
 
         except Exception as e:
-            logger.error(f"Login query error: {str(e)}")
+            logger.error("Login query error: %s", e)
             return render_template_string(login_page, error='Database query error')
 
     return render_template_string(login_page)
@@ -81,7 +365,7 @@ def dashboard():
             return "User ID is required", 400
 
         # Log the user ID for debugging
-        logger.info(f"Dashboard accessed for user ID: {user_id}")
+        logger.info("Dashboard accessed for user ID: %s", user_id)
         
         # Establish database connection
         session = get_db_connection()
@@ -91,10 +375,11 @@ def dashboard():
         
         # First, verify if the user exists
         query = text('SELECT userName FROM MobiUser WHERE userID = :user_id')
-        user = session.execute(query, {'user_id': user_id}).fetchone()
+        with phase('db_user'):
+            user = session.execute(query, {'user_id': user_id}).fetchone()
         
         if not user:
-            logger.error(f"User with ID {user_id} not found in database")
+            logger.error("User with ID %s not found in database", user_id)
             return f"User not found", 404
 
         # Fetch routes for the current user and month
@@ -103,15 +388,16 @@ def dashboard():
             FROM mobiRouteScheduleList 
             WHERE userID = :user_id AND MONTH = :current_month
         ''')
-        routes = session.execute(query, {'user_id': user_id, 'current_month': current_month}).fetchall()
+        with phase('db_routes'):
+            routes = session.execute(query, {'user_id': user_id, 'current_month': current_month}).fetchall()
         
         # Log the number of routes found
-        logger.info(f"Found {len(routes)} routes for user ID {user_id}")
+        logger.info("Found %d routes for user ID %s", len(routes), user_id)
         
         # Prepare route dropdown HTML
         if not routes:
             route_options = '<option value="">No routes available</option>'
-            logger.warning(f"No routes found for user ID {user_id} in month {current_month}")
+            logger.warning("No routes found for user ID %s in month %s", user_id, current_month)
         else:
             route_options = ''.join([f'<option value="{route[0]}">{route[0]}</option>' for route in routes])
 
@@ -386,6 +672,50 @@ def dashboard():
                     }}
                 }});
 
+                // Prefill invoice number, date and quantities suggested by the extraction stage
+                const extractionEnabled = {'true' if EXTRACTION_ENABLED else 'false'};
+
+                document.getElementById('invoice_file').addEventListener('change', function() {{
+                    if (!extractionEnabled || !this.files.length) {{
+                        return;
+                    }}
+
+                    const formData = new FormData();
+                    formData.append('invoice_file', this.files[0]);
+
+                    fetch('/extract_invoice', {{
+                        method: 'POST',
+                        body: formData
+                    }})
+                    .then(response => response.json())
+                    .then(data => {{
+                        if (!data.success) {{
+                            return;
+                        }}
+
+                        const fields = data.fields;
+                        const invoiceNumber = document.getElementById('invoice_number');
+                        const invoiceDate = document.getElementById('invoice_date');
+
+                        // Only fill inputs the rep has not already typed into
+                        if (fields.invoice_number && !invoiceNumber.value) {{
+                            invoiceNumber.value = fields.invoice_number;
+                        }}
+                        if (fields.invoice_date && !invoiceDate.value) {{
+                            invoiceDate.value = fields.invoice_date;
+                        }}
+                        Object.entries(fields.quantities || {{}}).forEach(([product, quantity]) => {{
+                            const input = document.getElementById(product);
+                            if (input && (input.value === '' || input.value === '0')) {{
+                                input.value = quantity;
+                            }}
+                        }});
+                    }})
+                    .catch(error => {{
+                        console.error('Extraction error:', error);
+                    }});
+                }});
+
                 document.getElementById('invoiceForm').addEventListener('submit', function(e) {{
                     e.preventDefault();
                     
@@ -425,7 +755,7 @@ def dashboard():
         return dashboard_page
 
     except Exception as e:
-        logger.error(f"Unexpected error in dashboard route: {str(e)}", exc_info=True)
+        logger.error("Unexpected error in dashboard route: %s", e, exc_info=True)
         return f"An unexpected error occurred: {str(e)}", 500
 
 # New route to fetch outlets based on route name
@@ -443,7 +773,8 @@ def get_outlets():
             FROM apOutlet 
             WHERE clientRoute = :route_name
         ''')
-        outlets = session.execute(query, {'route_name': route_name}).fetchall()
+        with phase('db_query'):
+            outlets = session.execute(query, {'route_name': route_name}).fetchall()
 
         # Close the session
         session.close()
@@ -451,7 +782,7 @@ def get_outlets():
         return jsonify([outlet[0] for outlet in outlets])
 
     except Exception as e:
-        logger.error(f"Unexpected error in get_outlets route: {str(e)}", exc_info=True)
+        logger.error("Unexpected error in get_outlets route: %s", e, exc_info=True)
         return f"An unexpected error occurred: {str(e)}", 500
 
 # New route to fetch products
@@ -468,7 +799,8 @@ def get_products():
                 FROM apProduct 
                 WHERE clientID = 79 AND deleted = 0
             ''')
-            products = session.execute(query).fetchall()
+            with phase('db_query'):
+                products = session.execute(query).fetchall()
 
             # Close the session
             session.close()
@@ -476,24 +808,45 @@ def get_products():
             return jsonify([product[0] for product in products])
 
         except Exception as e:
-            logger.error(f"Unexpected error in get_products route: {str(e)}", exc_info=True)
+            logger.error("Unexpected error in get_products route: %s", e, exc_info=True)
             return f"An unexpected error occurred: {str(e)}", 500
 
     except Exception as e:
-        logger.error(f"Unexpected error in get_products route: {str(e)}", exc_info=True)
+        logger.error("Unexpected error in get_products route: %s", e, exc_info=True)
         return f"An unexpected error occurred: {str(e)}", 500
 
+# Route to preview suggested invoice fields for an uploaded file
+@app.route('/extract_invoice', methods=['POST'])
+def extract_invoice_preview():
+    if not EXTRACTION_ENABLED:
+        return jsonify({'success': False, 'message': 'Invoice extraction is disabled'}), 404
+
+    try:
+        invoice_file = request.files.get('invoice_file')
+        if not invoice_file or invoice_file.filename == '':
+            return jsonify({'success': False, 'message': 'No invoice file uploaded'}), 400
+
+        file_extension = os.path.splitext(str(invoice_file.filename))[1].lower() or '.pdf'
+        with phase('extraction'):
+            fields = extract_invoice(invoice_file.read(), file_extension)
+
+        logger.info("Extracted invoice fields from %s: %s", invoice_file.filename, fields)
+        return jsonify({'success': True, 'fields': fields}), 200
+
+    except TimeoutError:
+        logger.warning("Invoice extraction timed out after %ss", EXTRACTION_TIMEOUT)
+        return jsonify({'success': False, 'message': 'Invoice extraction timed out'}), 504
+
+    except Exception as e:
+        logger.error("Unexpected error in extract_invoice: %s", e, exc_info=True)
+        return jsonify({'success': False, 'message': f'Unexpected error: {str(e)}'}), 500
+
 # Route to handle invoice upload
 @app.route('/upload_invoice', methods=['POST'])
 def upload_invoice():
     try:
-        # Azure Storage connection string
-        connection_string = "DefaultEndpointsProtocol=https;AccountName=ngstore;AccountKey=0kOBlNdR/pnuhQazkYliSE8BOyxm/KelSLaOuvGuMfJWRlQLUH2ZCsDd34skmg2dVq11QxODu12s+AStmuHgAQ==;EndpointSuffix=core.windows.net"
-        container_name = "invoiceupload"
-
-        # Create the BlobServiceClient object
-        blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-        container_client = blob_service_client.get_container_client(container_name)
+        # Azure Storage container client (created on first upload)
+        container_client = get_container_client()
 
         # Get form data
         user_id = request.form.get('user_id')
@@ -512,7 +865,8 @@ def upload_invoice():
         invoice_type = request.form.get('invoice_type')
         
         # Log received form data for debugging
-        logger.info(f"Received invoice upload data: user_id={user_id}, outlet_name={outlet_name}, invoice_date={invoice_date}, invoice_number={invoice_number}, invoice_type={invoice_type}")
+        logger.debug("Received invoice upload data: user_id=%s, outlet_name=%s, invoice_date=%s, invoice_number=%s, invoice_type=%s",
+                     user_id, outlet_name, invoice_date, invoice_number, invoice_type)
 
         # Get quantities for each product
         sensodent_k_fr_75gm = request.form.get('SENSODENT_K_FR_75GM', 0)
@@ -532,20 +886,21 @@ def upload_invoice():
         session = get_db_connection()
         try:
             query = text('SELECT outletCode FROM apOutlet WHERE outletName = :outlet_name')
-            outlet_result = session.execute(query, {'outlet_name': outlet_name}).fetchone()
+            with phase('db_outlet'):
+                outlet_result = session.execute(query, {'outlet_name': outlet_name}).fetchone()
             
             if not outlet_result:
-                logger.error(f"No outlet code found for outlet name: {outlet_name}")
+                logger.error("No outlet code found for outlet name: %s", outlet_name)
                 session.close()
                 return jsonify({'success': False, 'message': 'Outlet code not found'}), 400
             
             outlet_code = outlet_result[0]
-            logger.info(f"Found outlet code: {outlet_code} for outlet name: {outlet_name}")
+            logger.info("Found outlet code: %s for outlet name: %s", outlet_code, outlet_name)
 
             # Validate invoice type
             valid_invoice_types = ['Wholesale', 'Display']
             if invoice_type not in valid_invoice_types:
-                logger.error(f"Invalid invoice type: {invoice_type}")
+                logger.error("Invalid invoice type: %s", invoice_type)
                 session.close()
                 return jsonify({'success': False, 'message': 'Invalid Invoice Type selected'}), 400
 
@@ -557,8 +912,9 @@ def upload_invoice():
             # Upload file to Azure Blob Storage
             blob_client = container_client.get_blob_client(azure_filename)
             file_contents = invoice_file.read()
-            blob_client.upload_blob(file_contents, overwrite=True)
-            logger.info(f"Successfully uploaded file to Azure Blob Storage: {azure_filename}")
+            with phase('blob_upload'):
+                blob_client.upload_blob(file_contents, overwrite=True)
+            logger.info("Successfully uploaded file to Azure Blob Storage: %s", azure_filename)
 
             # Prepare invoice details query
             insert_query = text('''
@@ -577,34 +933,33 @@ def upload_invoice():
                 )
             ''')
 
-            # Execute the insert query
-            session.execute(insert_query, {
-                'user_id': user_id,
-                'outlet_code': outlet_code,
-                'outlet_name': outlet_name,
-                'invoice_available': True,
-                'display_type': 'Standard',
-                'invoice_date': invoice_date,
-                'invoice_number': invoice_number,
-                'invoice_document': azure_filename,
-                'sensodent_k_fr_75gm': sensodent_k_fr_75gm,
-                'sensodent_kf_cp_75gm': sensodent_kf_cp_75gm,
-                'sensodent_k_fr_125gm': sensodent_k_fr_125gm,
-                'sensodent_kf_cp_125gm': sensodent_kf_cp_125gm,
-                'sensodent_kf_cp_15g': sensodent_kf_cp_15g,
-                'sensodent_k_fr_15g': sensodent_k_fr_15g,
-                'kidodent_cavity_shield': kidodent_cavity_shield,
-                'invoice_type': invoice_type
-            })
-            
-            # Commit the transaction
-            session.commit()
-            logger.info(f"Successfully inserted invoice details for user {user_id}")
+            # Execute the insert query and commit the transaction
+            with phase('db_insert'):
+                session.execute(insert_query, {
+                    'user_id': user_id,
+                    'outlet_code': outlet_code,
+                    'outlet_name': outlet_name,
+                    'invoice_available': True,
+                    'display_type': 'Standard',
+                    'invoice_date': invoice_date,
+                    'invoice_number': invoice_number,
+                    'invoice_document': azure_filename,
+                    'sensodent_k_fr_75gm': sensodent_k_fr_75gm,
+                    'sensodent_kf_cp_75gm': sensodent_kf_cp_75gm,
+                    'sensodent_k_fr_125gm': sensodent_k_fr_125gm,
+                    'sensodent_kf_cp_125gm': sensodent_kf_cp_125gm,
+                    'sensodent_kf_cp_15g': sensodent_kf_cp_15g,
+                    'sensodent_k_fr_15g': sensodent_k_fr_15g,
+                    'kidodent_cavity_shield': kidodent_cavity_shield,
+                    'invoice_type': invoice_type
+                })
+                session.commit()
+            logger.info("Successfully inserted invoice details for user %s", user_id)
 
         except Exception as db_error:
             # Rollback the transaction in case of error
             session.rollback()
-            logger.error(f"Database error during invoice upload: {str(db_error)}", exc_info=True)
+            logger.error("Database error during invoice upload: %s", db_error, exc_info=True)
             return jsonify({'success': False, 'message': f'Database error: {str(db_error)}'}), 500
         
         finally:
@@ -615,9 +970,86 @@ def upload_invoice():
 
     except Exception as e:
         # Log any unexpected errors
-        logger.error(f"Unexpected error in upload_invoice: {str(e)}", exc_info=True)
+        logger.error("Unexpected error in upload_invoice: %s", e, exc_info=True)
+        return jsonify({'success': False, 'message': f'Unexpected error: {str(e)}'}), 500
+
+def fetch_invoice_document(document_name):
+    """Download a document into the local cache; returns None while the blob is archived."""
+    from azure.core.exceptions import HttpResponseError
+
+    blob_client = get_container_client().get_blob_client(document_name)
+    with phase('blob_properties'):
+        properties = blob_client.get_blob_properties()
+
+    # Archived blobs cannot be read until rehydrated, which takes hours
+    if properties.blob_tier == 'Archive':
+        if not properties.archive_status:
+            try:
+                blob_client.set_standard_blob_tier('Cool', rehydrate_priority='Standard')
+                logger.info("Requested rehydration of archived invoice document: %s", document_name)
+            except HttpResponseError as e:
+                # 409: a concurrent request already started the rehydration
+                if e.status_code != 409:
+                    raise
+        return None
+
+    with phase('blob_download'):
+        return cache_document(document_name, blob_client)
+
+# Route to retrieve an invoice document through the local read-through cache
+@app.route('/invoice_document/<path:document_name>')
+def invoice_document(document_name):
+    try:
+        # Identify the user from the signed login session, never from request parameters
+        user_id = login_session.get('user_id')
+        if user_id is None:
+            logger.error("Invoice document requested without a login session")
+            return jsonify({'success': False, 'message': 'Please log in to view invoice documents'}), 401
+
+        # Only serve documents recorded against an invoice the user uploaded
+        session = get_db_connection()
+        try:
+            query = text('''
+                SELECT TOP 1 InvoiceDocument
+                FROM InvoiceDetails
+                WHERE InvoiceDocument = :document_name AND UserID = :user_id
+            ''')
+            with phase('db_lookup'):
+                invoice = session.execute(query, {'document_name': document_name, 'user_id': user_id}).fetchone()
+        finally:
+            session.close()
+
+        if not invoice:
+            # Same response whether the document is missing or belongs to someone else
+            logger.error("No invoice document %s available to user ID %s", document_name, user_id)
+            return jsonify({'success': False, 'message': 'Invoice document not found'}), 404
+
+        mimetype = mimetypes.guess_type(document_name)[0] or 'application/octet-stream'
+        for attempt in range(2):
+            path = get_cached_document(document_name) or fetch_invoice_document(document_name)
+            if path is None:
+                return jsonify({
+                    'success': False,
+                    'message': 'Invoice document is archived; retrieval has been requested, please try again later'
+                }), 202
+
+            try:
+                # conditional=True enables Range and If-Modified-Since handling
+                return send_file(path, mimetype=mimetype, conditional=True, download_name=document_name)
+            except FileNotFoundError:
+                # Another worker evicted the file between lookup and open; fetch it again
+                if attempt:
+                    raise
+
+    except Exception as e:
+        logger.error("Unexpected error in invoice_document: %s", e, exc_info=True)
         return jsonify({'success': False, 'message': f'Unexpected error: {str(e)}'}), 500
 
+# Logging counters for this worker process (records enqueued, sampled out, dropped, queued)
+@app.route('/log_stats')
+def log_stats():
+    return jsonify(get_log_stats())
+
 # Security headers
 @app.after_request
 def add_security_headers(response):
@@ -720,6 +1152,9 @@ login_page = '''
 if __name__ == '__main__':
     print(f"\nAccess the application at:")
     print(f"Local:   http://localhost:5000\n")
+
+    if WARMUP_ON_START:
+        warm_up()
     
     # Run the app only on localhost
     app.run(host='localhost', port=5000, debug=True)
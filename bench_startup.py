@@ -0,0 +1,79 @@
+"""Cold-start benchmark: time to import app and serve the first GET / in a fresh interpreter.
+
+The eager baseline imports every heavy dependency before app, as app.py did before imports were
+deferred, so the difference to the lazy runs is what deferring them saves.
+
+Usage: python bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules app.py used to import at module load
+EAGER_IMPORTS = [
+    'dotenv',
+    'sqlalchemy',
+    'sqlalchemy.orm',
+    'azure.storage.blob',
+    'multiprocessing',
+    'concurrent.futures.process',
+    'invoice_extraction',
+]
+
+PROBE = '''
+import importlib, json, sys, time
+start = time.perf_counter()
+for module in %r:
+    importlib.import_module(module)
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (served - start) * 1000,
+    'status': response.status_code,
+    'sqlalchemy_loaded': 'sqlalchemy' in sys.modules,
+    'azure_loaded': 'azure.storage.blob' in sys.modules,
+    'dotenv_loaded': 'dotenv' in sys.modules,
+}))
+'''
+
+
+SCENARIOS = [
+    ('eager imports (baseline)', EAGER_IMPORTS, False),
+    ('lazy imports', [], False),
+    ('lazy imports, FAST_STARTUP=1', [], True),
+]
+
+
+def run_probe(eager_imports, fast_startup):
+    env = dict(os.environ, FAST_STARTUP='1' if fast_startup else '0', WARMUP_ON_START='0')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE % (eager_imports,)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    for name, eager_imports, fast_startup in SCENARIOS:
+        results = [run_probe(eager_imports, fast_startup) for _ in range(runs)]
+        last = results[-1]
+        print(f"{name} ({runs} runs)")
+        print(f"  import (deps + app): median {statistics.median(r['import_ms'] for r in results):.1f} ms")
+        print(f"  first GET / served:  median {statistics.median(r['first_request_ms'] for r in results):.1f} ms (status {last['status']})")
+        print(f"  loaded at first response: sqlalchemy={last['sqlalchemy_loaded']} "
+              f"azure={last['azure_loaded']} dotenv={last['dotenv_loaded']}")
+
+
+if __name__ == '__main__':
+    main()
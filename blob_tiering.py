@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+# Maximum sub-requests per Azure Blob batch request
+BLOB_BATCH_SIZE = 256
+
+# Cool blobs moved or deleted within this many days incur an early-deletion charge
+COOL_MINIMUM_DAYS = 30
+
+
+def select_tier_changes(blobs, invoice_documents, now, cool_after_days, archive_after_days, tier_change_grace_days):
+    """Group the invoice blobs that should change tier into {'Cool': [...], 'Archive': [...]}.
+
+    Age is the blob creation time, not the rep-entered InvoiceDate. Blobs already in the target tier,
+    awaiting rehydration, or whose tier changed within the grace period (e.g. rehydrated for an
+    audit) are left alone, and archived blobs are never moved back up.
+    """
+    cool_cutoff = now - timedelta(days=cool_after_days)
+    archive_cutoff = now - timedelta(days=archive_after_days) if archive_after_days else None
+    grace_cutoff = now - timedelta(days=tier_change_grace_days)
+
+    documents = {'Cool': [], 'Archive': []}
+    for blob in blobs:
+        if blob.name not in invoice_documents or blob.creation_time > cool_cutoff:
+            continue
+        if blob.blob_tier == 'Archive' or blob.archive_status:
+            continue
+        if blob.blob_tier_change_time and blob.blob_tier_change_time > grace_cutoff:
+            continue
+
+        tier = 'Archive' if archive_cutoff and blob.creation_time <= archive_cutoff else 'Cool'
+        if blob.blob_tier != tier:
+            documents[tier].append(blob.name)
+    return documents
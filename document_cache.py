@@ -0,0 +1,79 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+INVOICE_CACHE_DIR = os.getenv('INVOICE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'invoice_cache'))
+INVOICE_CACHE_MAX_BYTES = int(os.getenv('INVOICE_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+_evict_lock = threading.Lock()
+
+
+def _cache_path(document_name):
+    # Hashed file names keep arbitrary blob names out of the filesystem; the extension is kept for mimetypes
+    extension = os.path.splitext(document_name)[1].lower()
+    return os.path.join(INVOICE_CACHE_DIR, hashlib.sha256(document_name.encode('utf-8')).hexdigest() + extension)
+
+
+def _touch(path, modified):
+    # atime is the LRU timestamp; mtime stays at the blob's last-modified time because
+    # send_file derives Last-Modified and the ETag from it
+    os.utime(path, (time.time(), modified))
+
+
+def get_cached_document(document_name):
+    """Return the local path of a cached document, marking it as recently used, or None."""
+    path = _cache_path(document_name)
+    try:
+        _touch(path, os.stat(path).st_mtime)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def cache_document(document_name, blob_client):
+    """Stream a blob into the cache and evict least recently used documents over the size bound."""
+    os.makedirs(INVOICE_CACHE_DIR, exist_ok=True)
+    path = _cache_path(document_name)
+
+    # Write to a temporary file first so concurrent readers never see a partial document
+    fd, temp_path = tempfile.mkstemp(dir=INVOICE_CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            downloader = blob_client.download_blob()
+            downloader.readinto(temp_file)
+        _touch(temp_path, downloader.properties.last_modified.timestamp())
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    _evict(keep=path)
+    return path
+
+
+def _evict(keep):
+    with _evict_lock:
+        entries = []
+        for entry in os.scandir(INVOICE_CACHE_DIR):
+            if not entry.is_file() or entry.name.endswith('.tmp'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, entry.path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= INVOICE_CACHE_MAX_BYTES:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
@@ -0,0 +1,11 @@
+import os
+
+# Startup-optimised gunicorn settings (picked up automatically by `gunicorn app:app`).
+# GUNICORN_PRELOAD=1 imports the app once in the master and forks workers from it;
+# per-process resources are then created in post_worker_init.
+preload_app = os.getenv('GUNICORN_PRELOAD', '0').lower() in ('1', 'true', 'yes')
+
+
+def post_worker_init(worker):
+    from app import init_worker
+    init_worker()
@@ -0,0 +1,208 @@
+import io
+import re
+from datetime import datetime
+
+# Product catalogue: form field name -> description printed on invoices
+PRODUCT_CATALOGUE = {
+    'SENSODENT_K_FR_75GM': 'SENSODENT K FR 75GM',
+    'SENSODENT_KF_CP_75GM': 'SENSODENT KF CP 75GM',
+    'SENSODENT_K_FR_125GM': 'SENSODENT K FR 125GM',
+    'SENSODENT_KF_CP_125GM': 'SENSODENT KF CP 125GM',
+    'SENSODENT_KF_CP_15G': 'SENSODENT KF CP 15G',
+    'SENSODENT_K_FR_15G': 'SENSODENT K FR 15G',
+    'KIDODENT_CAVITY_SHIELD': 'KIDODENT CAVITY SHIELD',
+}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+INVOICE_NUMBER_PATTERN = re.compile(
+    r'\b(?:invoice|inv|bill)\s*(?:no|number|num|#)?\.?\s*[:#\-]?\s*((?=[A-Z\-/]*\d)[A-Z0-9][A-Z0-9\-/]{2,})',
+    re.IGNORECASE,
+)
+
+DATE_PATTERNS = [
+    (re.compile(r'\b(\d{4}-\d{1,2}-\d{1,2})\b'), ['%Y-%m-%d']),
+    (re.compile(r'\b(\d{1,2}[/\-.]\d{1,2}[/\-.]\d{4})\b'), ['%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y']),
+    (re.compile(r'\b(\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2})\b'), ['%d/%m/%y', '%d-%m-%y', '%d.%m.%y']),
+    (re.compile(r'\b(\d{1,2}[\s\-][A-Za-z]{3,9}[\s\-,]+\d{4})\b'), ['%d %b %Y', '%d-%b-%Y', '%d %B %Y', '%d-%B-%Y']),
+]
+
+# Labels that introduce the invoice date; "Due date" and similar are deliberately not matched
+INVOICE_DATE_LABEL = re.compile(r'\b(?:invoice|inv|bill)\.?\s*date\b|\bdated\b', re.IGNORECASE)
+GENERIC_DATE_LABEL = re.compile(r'(?<!due )(?<!due)\bdate\b', re.IGNORECASE)
+DATE_LABEL_WINDOW = 40
+
+# Numbers in a line item, with Indian or western thousands separators (1,200 / 1,20,000) and decimals
+NUMBER_PATTERN = re.compile(r'(?<![\w.,])(\d{1,3}(?:,\d{2,3})+|\d+)(?:\.(\d+))?(?![\w,]|\.\d)')
+INLINE_QUANTITY_PATTERN = re.compile(r'\b(?:qty|quantity)\b\s*[:\-.]?\s*(\d{1,3}(?:,\d{2,3})+|\d+)', re.IGNORECASE)
+
+# Header columns that hold a number on each line item, used to locate the quantity column
+QUANTITY_HEADER = re.compile(r'\b(?:qty|quantity)\b', re.IGNORECASE)
+NUMERIC_COLUMN_HEADER = re.compile(
+    r'\b(?:hsn\s*/\s*sac|hsn\s+code|taxable\s+value|unit\s+price|hsn|sac|qty|quantity|mrp|rate|price'
+    r'|disc(?:ount)?|cgst|sgst|igst|gst|tax|amount|amt|total|value)\b',
+    re.IGNORECASE,
+)
+
+# HSN codes are 4, 6 or 8 digits and sit between the description and the quantity
+HSN_PATTERN = re.compile(r'\d{4,8}')
+
+
+def _sku_pattern(description):
+    # Tolerate OCR spacing/punctuation and GM/G/GMS unit variants between tokens
+    tokens = []
+    for token in description.split():
+        match = re.fullmatch(r'(\d+)(GM|G)', token)
+        if match:
+            tokens.append(match.group(1) + r'\s*G(?:MS|M)?')
+        else:
+            tokens.append(re.escape(token))
+    return re.compile(r'\b' + r'[\s_\-.]*'.join(tokens) + r'\b', re.IGNORECASE)
+
+
+SKU_PATTERNS = {field: _sku_pattern(description) for field, description in PRODUCT_CATALOGUE.items()}
+
+
+def read_text(file_bytes, extension, ocr_timeout=0):
+    """Return the text of an invoice: the PDF text layer, or OCR output for images.
+
+    ocr_timeout (seconds, 0 for none) kills a tesseract run that hangs so it cannot hold a pool worker.
+    """
+    extension = extension.lower()
+
+    if extension == '.pdf':
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            return ''
+        reader = PdfReader(io.BytesIO(file_bytes))
+        return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+    if extension in IMAGE_EXTENSIONS:
+        try:
+            import pytesseract
+            from PIL import Image
+        except ImportError:
+            return ''
+        with Image.open(io.BytesIO(file_bytes)) as image:
+            try:
+                return pytesseract.image_to_string(image, timeout=ocr_timeout)
+            except RuntimeError:
+                # pytesseract raises RuntimeError when the timeout kills tesseract
+                return ''
+
+    return ''
+
+
+def parse_invoice_number(text):
+    match = INVOICE_NUMBER_PATTERN.search(text)
+    return match.group(1) if match else None
+
+
+def _find_dates(text):
+    """Return (position, YYYY-MM-DD) for every recognisable date, in order of position."""
+    dates = {}
+    for pattern, formats in DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            if match.start() in dates:
+                continue
+            value = re.sub(r'[\s,]+', ' ', match.group(1)).strip()
+            for date_format in formats:
+                try:
+                    dates[match.start()] = datetime.strptime(value, date_format).strftime('%Y-%m-%d')
+                    break
+                except ValueError:
+                    continue
+    return sorted(dates.items())
+
+
+def parse_invoice_date(text):
+    """Return the invoice date as YYYY-MM-DD (the dashboard date input format).
+
+    Prefers a date just after an "Invoice Date"/"Date" label, then the earliest date in the text.
+    """
+    dates = _find_dates(text)
+    if not dates:
+        return None
+
+    for label_pattern in (INVOICE_DATE_LABEL, GENERIC_DATE_LABEL):
+        for label in label_pattern.finditer(text):
+            for position, value in dates:
+                if label.end() <= position <= label.end() + DATE_LABEL_WINDOW:
+                    return value
+
+    return dates[0][1]
+
+
+def _quantity_column(text):
+    """Index of the quantity among the numeric columns after the description, from the table header.
+
+    Only a line naming Qty and at least one other column counts as a header; text layers that put
+    each header cell on its own line give no usable column positions.
+    """
+    for line in text.splitlines():
+        if not QUANTITY_HEADER.search(line) or any(pattern.search(line) for pattern in SKU_PATTERNS.values()):
+            continue
+        columns = [column.group(0).lower() for column in NUMERIC_COLUMN_HEADER.finditer(line)]
+        if len(columns) < 2:
+            continue
+        for index, column in enumerate(columns):
+            if QUANTITY_HEADER.fullmatch(column):
+                return index
+    return None
+
+
+def _to_quantity(integer_part, fraction):
+    # Quantities are whole units; a non-zero fraction means this is a price, not a quantity
+    if fraction and int(fraction) != 0:
+        return None
+    return int(integer_part.replace(',', ''))
+
+
+def _line_quantity(line, start, column):
+    inline = INLINE_QUANTITY_PATTERN.search(line, start)
+    if inline:
+        return int(inline.group(1).replace(',', ''))
+
+    numbers = [(number.group(1), number.group(2)) for number in NUMBER_PATTERN.finditer(line, start)]
+
+    if column is not None and column < len(numbers):
+        integer_part, fraction = numbers[column]
+        # A header that does not match this line's layout can point at the HSN code; fall through
+        if fraction is not None or not HSN_PATTERN.fullmatch(integer_part):
+            return _to_quantity(integer_part, fraction)
+
+    # No header: prices carry decimals, so take a plain integer, skipping HSN-like codes ahead of it
+    integers = [integer_part for integer_part, fraction in numbers if fraction is None]
+    for position, integer_part in enumerate(integers):
+        if HSN_PATTERN.fullmatch(integer_part) and position + 1 < len(integers):
+            continue
+        return int(integer_part.replace(',', ''))
+    return None
+
+
+def parse_quantities(text):
+    column = _quantity_column(text)
+    quantities = {}
+    for line in text.splitlines():
+        for field, pattern in SKU_PATTERNS.items():
+            match = pattern.search(line)
+            if not match:
+                continue
+            quantity = _line_quantity(line, match.end(), column)
+            if quantity:
+                quantities[field] = quantities.get(field, 0) + quantity
+    return quantities
+
+
+def extract_invoice_fields(file_bytes, extension, ocr_timeout=0):
+    """Suggest invoice number, date and product quantities for an uploaded invoice.
+
+    Runs inside the extraction process pool, so it must stay importable without Flask.
+    """
+    text = read_text(file_bytes, extension, ocr_timeout)
+    return {
+        'invoice_number': parse_invoice_number(text),
+        'invoice_date': parse_invoice_date(text),
+        'quantities': parse_quantities(text),
+    }
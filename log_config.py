@@ -0,0 +1,153 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+LOG_INFO_SAMPLE_RATE = float(os.getenv('LOG_INFO_SAMPLE_RATE', '1.0'))
+LOG_MAX_MESSAGE_LENGTH = int(os.getenv('LOG_MAX_MESSAGE_LENGTH', '2000'))
+
+# Pass as `extra=` to keep a record below WARNING regardless of LOG_INFO_SAMPLE_RATE
+NO_SAMPLING = {'skip_sampling': True}
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id', 'skip_sampling'}
+
+_stats = {'enqueued': 0, 'sampled_out': 0, 'dropped': 0}
+_stats_lock = threading.Lock()
+_listener = None
+_listener_pid = None
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def get_log_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['queued'] = _listener.queue.qsize() if _listener is not None else 0
+    return stats
+
+
+def _truncate(message):
+    if len(message) > LOG_MAX_MESSAGE_LENGTH:
+        return message[:LOG_MAX_MESSAGE_LENGTH] + '...[truncated]'
+    return message
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields are emitted as top-level keys."""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', None),
+            'message': _truncate(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s - %(levelname)s - %(request_id)s - %(message)s')
+
+    def formatMessage(self, record):
+        record.message = _truncate(record.message)
+        return super().formatMessage(record)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of records below WARNING; warnings, errors and NO_SAMPLING records always pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or getattr(record, 'skip_sampling', False):
+            return True
+        if self.rate >= 1.0 or random.random() < self.rate:
+            return True
+        _count('sampled_out')
+        return False
+
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the current request ID on the calling thread."""
+
+    def __init__(self, get_request_id):
+        super().__init__()
+        self.get_request_id = get_request_id
+
+    def filter(self, record):
+        record.request_id = self.get_request_id() or '-'
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to the listener thread without formatting them or blocking."""
+
+    def prepare(self, record):
+        # Message formatting happens on the listener thread, off the request path
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            _count('enqueued')
+        except queue.Full:
+            _count('dropped')
+
+
+def configure_logging(get_request_id=lambda: None):
+    """Route all logging through a bounded queue drained by a background listener.
+
+    Safe to call again after fork: the child gets its own queue and listener thread.
+    """
+    global _listener, _listener_pid
+
+    if _listener is not None and _listener_pid == os.getpid():
+        return _listener
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter())
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    # Context first, so every record is attributed to its request before sampling drops any
+    queue_handler.addFilter(ContextFilter(get_request_id))
+    queue_handler.addFilter(SamplingFilter(LOG_INFO_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+
+    # A listener inherited through fork has no running thread in this process; just replace it
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener_pid = os.getpid()
+    _listener.start()
+    atexit.register(_stop_listener, _listener, _listener_pid)
+    return _listener
+
+
+def _stop_listener(listener, pid):
+    # Flush remaining records on shutdown, only in the process that started the listener
+    if pid == os.getpid():
+        listener.stop()
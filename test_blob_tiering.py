@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from blob_tiering import select_tier_changes
+
+NOW = datetime(2024, 6, 30, tzinfo=timezone.utc)
+
+
+def blob(name, age_days, tier='Hot', archive_status=None, tier_changed_days_ago=None):
+    return SimpleNamespace(
+        name=name,
+        creation_time=NOW - timedelta(days=age_days),
+        blob_tier=tier,
+        archive_status=archive_status,
+        blob_tier_change_time=NOW - timedelta(days=tier_changed_days_ago) if tier_changed_days_ago is not None else None,
+    )
+
+
+def select(blobs, invoice_documents=None, archive_after_days=180):
+    if invoice_documents is None:
+        invoice_documents = {b.name for b in blobs}
+    return select_tier_changes(blobs, invoice_documents, NOW, 30, archive_after_days, 30)
+
+
+def test_tiers_by_blob_age():
+    blobs = [blob('new.pdf', 5), blob('month.pdf', 40), blob('old.pdf', 200)]
+    assert select(blobs) == {'Cool': ['month.pdf'], 'Archive': ['old.pdf']}
+
+
+def test_archive_disabled():
+    assert select([blob('old.pdf', 400)], archive_after_days=0) == {'Cool': ['old.pdf'], 'Archive': []}
+
+
+def test_skips_blobs_not_recorded_against_an_invoice():
+    assert select([blob('stray.pdf', 40)], invoice_documents=set()) == {'Cool': [], 'Archive': []}
+
+
+def test_skips_blobs_already_in_target_tier():
+    blobs = [blob('cool.pdf', 40, tier='Cool'), blob('archived.pdf', 200, tier='Archive')]
+    assert select(blobs) == {'Cool': [], 'Archive': []}
+
+
+def test_leaves_rehydrated_and_rehydrating_blobs_alone():
+    blobs = [
+        blob('rehydrated.pdf', 200, tier='Cool', tier_changed_days_ago=3),
+        blob('pending.pdf', 200, tier='Archive', archive_status='rehydrate-pending-to-cool'),
+    ]
+    assert select(blobs) == {'Cool': [], 'Archive': []}
+
+
+def test_archives_after_grace_period():
+    blobs = [blob('rehydrated.pdf', 200, tier='Cool', tier_changed_days_ago=45)]
+    assert select(blobs) == {'Cool': [], 'Archive': ['rehydrated.pdf']}
+
+
+def test_never_moves_archived_blob_up():
+    # Archive age raised after the blob was archived; moving it to Cool would be a rehydration
+    assert select([blob('archived.pdf', 200, tier='Archive')], archive_after_days=365) == {'Cool': [], 'Archive': []}
@@ -0,0 +1,71 @@
+import os
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import document_cache
+
+LAST_MODIFIED = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeBlobClient:
+    def __init__(self, data):
+        self.data = data
+
+    def download_blob(self):
+        return SimpleNamespace(
+            readinto=lambda stream: stream.write(self.data),
+            properties=SimpleNamespace(last_modified=LAST_MODIFIED),
+        )
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_cache, 'INVOICE_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(document_cache, 'INVOICE_CACHE_MAX_BYTES', 250)
+
+
+def set_atime(name, atime):
+    path = document_cache._cache_path(name)
+    os.utime(path, (atime, os.stat(path).st_mtime))
+
+
+def test_read_through():
+    assert document_cache.get_cached_document('a.pdf') is None
+    path = document_cache.cache_document('a.pdf', FakeBlobClient(b'invoice'))
+    assert path.endswith('.pdf')
+    assert document_cache.get_cached_document('a.pdf') == path
+    with open(path, 'rb') as cached:
+        assert cached.read() == b'invoice'
+
+
+def test_hits_keep_mtime_at_blob_last_modified():
+    path = document_cache.cache_document('a.pdf', FakeBlobClient(b'x' * 10))
+    document_cache.get_cached_document('a.pdf')
+    assert os.stat(path).st_mtime == LAST_MODIFIED.timestamp()
+
+
+def test_evicts_least_recently_used_over_size_bound():
+    document_cache.cache_document('a.pdf', FakeBlobClient(b'x' * 100))
+    document_cache.cache_document('b.pdf', FakeBlobClient(b'x' * 100))
+    set_atime('a.pdf', 1000)
+    set_atime('b.pdf', 2000)
+
+    # A hit makes a.pdf the most recently used, so b.pdf goes first
+    document_cache.get_cached_document('a.pdf')
+    document_cache.cache_document('c.pdf', FakeBlobClient(b'x' * 100))
+
+    assert document_cache.get_cached_document('a.pdf') is not None
+    assert document_cache.get_cached_document('b.pdf') is None
+    assert document_cache.get_cached_document('c.pdf') is not None
+
+
+def test_failed_download_leaves_no_partial_file(tmp_path):
+    class BrokenBlobClient:
+        def download_blob(self):
+            raise IOError('connection reset')
+
+    with pytest.raises(IOError):
+        document_cache.cache_document('a.pdf', BrokenBlobClient())
+    assert os.listdir(tmp_path) == []
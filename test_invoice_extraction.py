@@ -0,0 +1,54 @@
+import pytest
+
+from invoice_extraction import parse_invoice_date, parse_invoice_number, parse_quantities
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('TAX INVOICE\nInvoice No: INV-2024/0012', 'INV-2024/0012'),
+    ('Inv # 58213', '58213'),
+    ('Bill No. KA/24-25/771', 'KA/24-25/771'),
+    ('Tax Invoice\nInvoice Date: 05/03/2024', None),
+])
+def test_parse_invoice_number(text, expected):
+    assert parse_invoice_number(text) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Invoice Date: 12/03/2024\nPayment terms 30 days\nDue date 2024-04-12', '2024-03-12'),
+    ('Due Date: 2024-04-12\nDate: 12.03.2024', '2024-03-12'),
+    ('Dated 5 Mar 2024', '2024-03-05'),
+    ('Inv. Date 07-11-23', '2023-11-07'),
+    ('Printed 12/03/2024, reprinted 2024-05-01', '2024-03-12'),
+    ('No dates here', None),
+])
+def test_parse_invoice_date(text, expected):
+    assert parse_invoice_date(text) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    # HSN code ahead of the quantity, no table header
+    ('KIDODENT CAVITY SHIELD 3306 24 30.50 732', {'KIDODENT_CAVITY_SHIELD': 24}),
+    ('SENSODENT KF CP 125GM 3004 9099 10', {'SENSODENT_KF_CP_125GM': 10}),
+    # Inline label with a thousands separator
+    ('SENSODENT K FR 75GM Qty: 1,200', {'SENSODENT_K_FR_75GM': 1200}),
+    # Quantity column located from the header
+    ('Sl Description HSN/SAC Qty Rate Amount\n1 SENSODENT K FR 75GM 33061020 24 45.00 1,080.00',
+     {'SENSODENT_K_FR_75GM': 24}),
+    # Header cells on separate lines (common in PDF text layers) give no column positions
+    ('Description\nHSN/SAC\nQty\nRate\nAmount\nSENSODENT K FR 75GM 33061020 24 45.00 1,080.00',
+     {'SENSODENT_K_FR_75GM': 24}),
+    # A header whose Qty position lands on an HSN code is not trusted
+    ('Qty Rate Amount\nSENSODENT K FR 75GM 3306 24 45.00 1,080.00', {'SENSODENT_K_FR_75GM': 24}),
+    ('Description MRP Qty Rate Amount\nSENSODENT K FR 125GM 95.00 1,200 80.00 96,000.00',
+     {'SENSODENT_K_FR_125GM': 1200}),
+    # Prices with decimals are never taken as quantities
+    ('SENSODENT K FR 75GM 1200 45.00 54000.00', {'SENSODENT_K_FR_75GM': 1200}),
+    ('Kidodent Cavity Shield 4.50 x 7', {'KIDODENT_CAVITY_SHIELD': 7}),
+    # OCR spacing and unit variants; 15G must not match 125GM
+    ('Sensodent KF-CP 15 GMS 3 10.50 31.50\nSENSODENT KF CP 125GM 2 80.00 160.00',
+     {'SENSODENT_KF_CP_15G': 3, 'SENSODENT_KF_CP_125GM': 2}),
+    # Repeated lines for the same SKU are summed
+    ('SENSODENT K FR 15G 2\nSENSODENT K FR 15G 5', {'SENSODENT_K_FR_15G': 7}),
+])
+def test_parse_quantities(text, expected):
+    assert parse_quantities(text) == expected